@@ -7,8 +7,9 @@ It generates a detailed report showing which devices are duplicates and which on
 based on the most recent report date.
 
 Requirements:
-- Python 3.6+
+- Python 3.7+
 - requests library (pip install requests)
+- Optional: orjson (pip install orjson) for faster decoding of large API responses
 
 Usage:
 1. Create a .env file with your credentials (script will help you create one)
@@ -21,22 +22,131 @@ WATCHMAN_API_KEY=your_api_key
 """
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
-import argparse
 import sys
 import os
-import smtplib
-import ssl
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from email.mime.base import MIMEBase
-from email import encoders
-from datetime import datetime
+import re
+from datetime import datetime, timezone
+from types import SimpleNamespace
 from typing import Dict, List, Tuple, Optional
-from collections import defaultdict
+from collections import Counter, namedtuple
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from functools import lru_cache
+from itertools import chain
+from operator import attrgetter
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlparse
+import random
 import time
 
-# No external dependencies beyond requests needed
+# No external dependencies beyond requests needed; orjson is used for decoding when installed
+# (numpy is imported on demand for very large date columns)
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+# Concurrent page requests when paginating; stays well under the 400 requests/minute limit
+PAGE_FETCH_WORKERS = 8
+
+# Distinct last_report values needed before batch parsing with numpy outweighs its import time
+NUMPY_DATE_COLUMN_MIN = 50000
+
+# Rate-limited (429) retries per API request before giving up
+RATE_LIMIT_RETRIES = 5
+
+# Stands in for missing/unparseable last_report dates so they sort after every real date
+UNKNOWN_REPORT_DATE = datetime.min
+
+# Default --csv-filename
+DEFAULT_CSV_FILENAME = 'watchman_duplicates_report.csv'
+
+# Boolean flags parse_args() reads straight from argv; any other argument goes through argparse
+_FAST_PATH_FLAGS = frozenset(('--verbose', '--reset-env', '--export-csv', '--no-email', '--email-only'))
+
+# Column order for the CSV export
+CSV_FIELDNAMES = (
+    'Status', 'MAC_Address', 'Computer_Name', 'Client_ID', 'UID',
+    'Last_Report', 'Serial_Number', 'OS_Version', 'Group',
+    'Computer_URL', 'Reason'
+)
+
+# KEY=value lines in the .env file, and the config field each supported key maps to
+_ENV_LINE_RE = re.compile(r'^[ \t]*([A-Z0-9_]+)[ \t]*=[ \t]*(.*?)[ \t]*$', re.M)
+_ENV_FIELDS = {
+    'WATCHMAN_SUBDOMAIN': 'subdomain',
+    'WATCHMAN_API_KEY': 'api_key',
+    'SMTP_SERVER': 'smtp_server',
+    'SMTP_PORT': 'smtp_port',
+    'SMTP_USERNAME': 'smtp_username',
+    'SMTP_PASSWORD': 'smtp_password',
+    'EMAIL_FROM': 'email_from',
+    'EMAIL_TO': 'email_to',
+    'SMTP_USE_TLS': 'smtp_use_tls',
+}
+
+# Report fields of a duplicate computer, extracted once from the API dict (missing values use
+# the report defaults) together with its parsed last_report date
+Device = namedtuple('Device', [
+    'computer_name', 'client_id', 'uid', 'last_report', 'serial_number',
+    'os_version', 'group', 'computer_url', 'parsed_date'
+])
+
+# Device fields copied as-is from the API dict and into report device_info dicts (all but
+# parsed_date), and the default for each when the API omits it
+_DEVICE_INFO_KEYS = Device._fields[:-1]
+_DEVICE_INFO_DEFAULTS = ('Unknown', 'Unknown', 'Unknown', None, 'Unknown', 'Unknown', 'Unknown', 'N/A')
+
+@dataclass
+class ReportResults:
+    """Outcome of a duplicate analysis; devices and groups are report dicts (see _device_info)"""
+    total_duplicate_groups: int
+    total_duplicate_devices: int
+    devices_to_keep: List[Dict] = field(default_factory=list)
+    devices_to_remove: List[Dict] = field(default_factory=list)
+    duplicate_groups_detail: List[Dict] = field(default_factory=list)
+    total_computers_analyzed: int = 0
+
+# Separators stripped from MAC addresses before comparison
+_MAC_STRIP = str.maketrans('', '', ':-_ \t\r\n')
+
+# Characters a normalized (lowercase, separator-free) MAC address may contain
+_HEX_DIGITS = frozenset('0123456789abcdef')
+
+# OS types returned by _get_os_type; the index is packed into the low bits of grouping keys
+_OS_TYPES = ('macos', 'windows', 'linux', 'unknown')
+_OS_TYPE_INDEX = {os_type: index for index, os_type in enumerate(_OS_TYPES)}
+
+@lru_cache(maxsize=8192)
+def _parse_iso_datetime(value: str) -> datetime:
+    """
+    Parse an ISO-8601 string with the C-level fromisoformat parser
+    
+    Aware timestamps are converted to naive UTC so they compare cleanly with
+    UNKNOWN_REPORT_DATE (and match the numpy column parser and _epoch_to_datetime).
+    Raises ValueError if the string is not ISO-8601. Results are memoized at module
+    level, so timestamps repeated across pages, groups and reporter instances parse once.
+    """
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+def _epoch_to_datetime(value: float) -> datetime:
+    """Convert a Unix timestamp to naive UTC, matching _parse_iso_datetime's results"""
+    return datetime.fromtimestamp(value, timezone.utc).replace(tzinfo=None)
+
+def _device_info(device: Device) -> Dict:
+    """Build the report dict for a Device"""
+    device_info = dict(zip(_DEVICE_INFO_KEYS, device))
+    # Whole seconds, as reports have always shown; fractions only matter for sorting
+    device_info['last_report_parsed'] = (device.parsed_date.isoformat(timespec='seconds')
+                                         if device.parsed_date != UNKNOWN_REPORT_DATE else 'Unknown')
+    return device_info
 
 class WatchmanAPI:
     def __init__(self, subdomain: str, api_key: str):
@@ -44,8 +154,15 @@ class WatchmanAPI:
         self.api_key = api_key
         self.session = requests.Session()
         
-    def _make_request(self, endpoint: str, method: str = 'GET', params: Dict = None, data: Dict = None) -> Dict:
-        """Make API request with error handling and rate limiting"""
+        # Keep-alive pool sized for concurrent page fetches, with retries on transient gateway errors.
+        # 429 is left out so rate limiting is only retried (and logged) by _send_request's back-off.
+        retries = Retry(total=3, backoff_factor=0.5, status_forcelist=[502, 503, 504], raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=32, max_retries=retries)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({'Accept': 'application/json', 'Accept-Encoding': 'gzip'})
+        
+    def _send_request(self, endpoint: str, method: str = 'GET', params: Dict = None, data: Dict = None) -> requests.Response:
+        """Send API request with error handling and rate limiting, returning the raw response"""
         url = f"{self.base_url}/{endpoint}"
         
         # Add API key to params
@@ -54,27 +171,29 @@ class WatchmanAPI:
         params['api_key'] = self.api_key
         
         try:
-            if method == 'GET':
-                response = self.session.get(url, params=params)
-            elif method == 'DELETE':
-                response = self.session.delete(url, params=params)
-            elif method == 'PUT':
-                response = self.session.put(url, params=params, data=data)
-            else:
-                raise ValueError(f"Unsupported HTTP method: {method}")
+            for attempt in range(RATE_LIMIT_RETRIES + 1):
+                if method == 'GET':
+                    response = self.session.get(url, params=params)
+                elif method == 'DELETE':
+                    response = self.session.delete(url, params=params)
+                elif method == 'PUT':
+                    response = self.session.put(url, params=params, data=data)
+                else:
+                    raise ValueError(f"Unsupported HTTP method: {method}")
                 
-            # Handle rate limiting (400 requests/minute)
-            if response.status_code == 429:
-                print("Rate limit hit, waiting 60 seconds...")
-                time.sleep(60)
-                return self._make_request(endpoint, method, params, data)
+                # Handle rate limiting (400 requests/minute); once retries run out the 429
+                # falls through to raise_for_status below
+                if response.status_code != 429 or attempt == RATE_LIMIT_RETRIES:
+                    break
+                
+                # Jittered exponential backoff so concurrent page fetches don't retry in lockstep,
+                # never shorter than the server's Retry-After
+                delay = max(self._retry_after(response), min(60, 1 << attempt) + random.random())
+                print(f"Rate limit hit, waiting {delay:.0f} seconds...")
+                time.sleep(delay)
             
             response.raise_for_status()
-            
-            if method == 'DELETE' and response.status_code == 204:
-                return {"status": "deleted"}
-                
-            return response.json()
+            return response
             
         except requests.exceptions.RequestException as e:
             print(f"API request failed: {e}")
@@ -82,38 +201,115 @@ class WatchmanAPI:
                 print(f"Response: {e.response.text}")
             sys.exit(1)
     
+    @staticmethod
+    def _retry_after(response: requests.Response) -> int:
+        """Seconds requested by a Retry-After header, or 0 when absent or not in seconds"""
+        try:
+            return int(response.headers.get('Retry-After', 0))
+        except ValueError:
+            return 0
+    
+    def _make_request(self, endpoint: str, method: str = 'GET', params: Dict = None, data: Dict = None) -> Dict:
+        """Make API request with error handling and rate limiting"""
+        response = self._send_request(endpoint, method, params, data)
+        
+        if method == 'DELETE' and response.status_code == 204:
+            return {"status": "deleted"}
+        
+        try:
+            return _json_loads(response.content)
+        except ValueError as e:
+            print(f"API request failed: invalid JSON response: {e}")
+            sys.exit(1)
+    
+    def _fetch_computers_page(self, page: int, per_page: int) -> List[Dict]:
+        """Fetch a single page of computers, returning an empty list when there is no data"""
+        params = {
+            'page': page,
+            'per_page': per_page,
+            'order': 'last_reported_desc'
+        }
+        response = self._make_request('computers', params=params)
+        
+        if not response or not isinstance(response, list):
+            return []
+        return response
+    
+    def _discover_total_pages(self, per_page: int) -> Optional[int]:
+        """Probe the computers endpoint for a total count; None when the API doesn't expose one"""
+        response = self._send_request('computers', params={'per_page': 1})
+        
+        total = response.headers.get('X-Total-Count')
+        if total is None:
+            # With per_page=1 the page number of the "last" link equals the total count
+            last_url = response.links.get('last', {}).get('url')
+            if last_url:
+                total = parse_qs(urlparse(last_url).query).get('page', [None])[0]
+        
+        try:
+            total = int(total)
+        except (TypeError, ValueError):
+            return None
+        return -(-total // per_page)
+    
     def get_all_computers(self) -> List[Dict]:
         """Fetch all computers from Watchman API with pagination"""
-        computers = []
-        page = 1
         per_page = 100  # Maximum allowed per page
         
         print("Fetching all computers from Watchman API...")
         
-        while True:
-            print(f"Fetching page {page}...")
-            params = {
-                'page': page,
-                'per_page': per_page,
-                'order': 'last_reported_desc'
-            }
-            
-            response = self._make_request('computers', params=params)
-            
-            if not response or not isinstance(response, list):
-                break
-                
-            computers.extend(response)
+        total_pages = self._discover_total_pages(per_page)
+        
+        if total_pages is not None:
+            # Total is known up front, so every page can be requested in parallel
+            computers = []
+            last_page_full = True
+            if total_pages:
+                print(f"Fetching {total_pages} page(s)...")
+                with ThreadPoolExecutor(max_workers=PAGE_FETCH_WORKERS) as executor:
+                    for response in executor.map(lambda page: self._fetch_computers_page(page, per_page),
+                                                 range(1, total_pages + 1)):
+                        computers.extend(response)
+                last_page_full = len(response) == per_page
             
-            # Check if we got fewer results than requested (last page)
-            if len(response) < per_page:
-                break
-                
-            page += 1
+            # The probed total can be stale; keep paging until a short page confirms the end
+            if last_page_full:
+                computers.extend(self._fetch_pages_until_short(per_page, total_pages + 1))
+        else:
+            computers = self._fetch_pages_until_short(per_page)
             
         print(f"Fetched {len(computers)} total computers")
         return computers
     
+    def _fetch_pages_until_short(self, per_page: int, first_page: int = 1) -> List[Dict]:
+        """Fetch pages from first_page on without a known total, stopping at the first short page"""
+        # Fetch the first page on its own; small accounts never need the thread pool
+        print(f"Fetching page {first_page}...")
+        computers = self._fetch_computers_page(first_page, per_page)
+        
+        if len(computers) == per_page:
+            # Fetch remaining pages in concurrent blocks until a short page marks the end
+            next_page = first_page + 1
+            with ThreadPoolExecutor(max_workers=PAGE_FETCH_WORKERS) as executor:
+                while True:
+                    pages = range(next_page, next_page + PAGE_FETCH_WORKERS)
+                    print(f"Fetching pages {pages[0]}-{pages[-1]}...")
+                    
+                    last_page_reached = False
+                    for response in executor.map(lambda page: self._fetch_computers_page(page, per_page), pages):
+                        computers.extend(response)
+                        
+                        # Check if we got fewer results than requested (last page)
+                        if len(response) < per_page:
+                            last_page_reached = True
+                            break
+                    
+                    if last_page_reached:
+                        break
+                    next_page += PAGE_FETCH_WORKERS
+        
+        return computers
+    
     def delete_computer(self, computer_uid: str, computer_id: str) -> bool:
         """Delete a computer by its Watchman ID (client_id) - NOT SUPPORTED BY API"""
         # Note: Computer deletion is not supported via the Watchman API
@@ -124,6 +320,34 @@ class WatchmanAPI:
 class DuplicateReporter:
     def __init__(self, api: WatchmanAPI):
         self.api = api
+        # Parser used for every record; adapt_parser() swaps in a type-specialized one
+        self._parse_last = self.parse_last_report
+        
+    def adapt_parser(self, sample):
+        """Pick a parser specialized for the type the API returns, based on one sample value"""
+        if isinstance(sample, str):
+            self._parse_last = self._parse_iso_str
+        elif isinstance(sample, (int, float)):
+            self._parse_last = self._parse_epoch
+        else:
+            self._parse_last = self.parse_last_report
+    
+    def _parse_iso_str(self, last_report: str) -> Optional[datetime]:
+        """Parse an ISO-8601 last_report, deferring anything else to parse_last_report"""
+        try:
+            parsed = _parse_iso_datetime(last_report)
+        except (ValueError, TypeError, AttributeError):
+            return self.parse_last_report(last_report)
+        return parsed
+    
+    def _parse_epoch(self, last_report) -> Optional[datetime]:
+        """Parse an epoch last_report, deferring anything else to parse_last_report"""
+        if not last_report:
+            return None
+        try:
+            return _epoch_to_datetime(last_report)
+        except (ValueError, TypeError, OverflowError, OSError):
+            return self.parse_last_report(last_report)
         
     def parse_last_report(self, last_report: str) -> Optional[datetime]:
         """Parse last_report timestamp into datetime object"""
@@ -132,53 +356,150 @@ class DuplicateReporter:
             
         try:
             # Handle different possible formats
-            if isinstance(last_report, int):
-                return datetime.fromtimestamp(last_report)
+            if isinstance(last_report, (int, float)):
+                return _epoch_to_datetime(last_report)
             elif isinstance(last_report, str):
-                # Try parsing ISO format first
+                # Fast path: ISO-8601 as returned by the API (C-level parser)
+                try:
+                    return _parse_iso_datetime(last_report)
+                except ValueError:
+                    pass
+
                 if 'T' in last_report:
-                    # Remove timezone info for parsing
-                    clean_date = last_report.split('.')[0].replace('T', ' ')
-                    if '+' in clean_date or '-' in clean_date[-6:]:
-                        clean_date = clean_date.split('+')[0].split('-')[0]
+                    # Fallback for ISO variants fromisoformat rejects (e.g. odd fractions)
+                    clean_date = last_report.split('.')[0].replace('T', ' ')[:19]
                     return datetime.strptime(clean_date, '%Y-%m-%d %H:%M:%S')
                 else:
                     # Try parsing as timestamp
-                    return datetime.fromtimestamp(float(last_report))
-        except (ValueError, TypeError) as e:
+                    return _epoch_to_datetime(float(last_report))
+        except (ValueError, TypeError, OverflowError, OSError) as e:
             print(f"Warning: Could not parse last_report '{last_report}': {e}")
             return None
     
-    def find_duplicates(self, computers: List[Dict]) -> Dict[str, List[Dict]]:
-        """Find duplicate computers based on system_mac_address AND operating system type"""
-        mac_os_groups = defaultdict(list)
+    def find_duplicates(self, computers: List[Dict]) -> Dict[str, List[Device]]:
+        """
+        Find duplicate computers based on system_mac_address AND operating system type
+        
+        Returns:
+            dict: Composite key -> list of Device tuples, newest first.
+                  Missing or unparseable dates are UNKNOWN_REPORT_DATE.
+        """
+        # Columnar view: packed MAC/OS keys and the source dicts, aligned by index
+        mac_keys, metas = self._build_columns(computers)
+        index_groups = self._group_duplicate_indices(mac_keys)
+        
+        # Parse the date column only for rows that are actually duplicated
+        duplicate_indices = [index for indices in index_groups.values() for index in indices]
+        last_reports = [metas[index].get('last_report') for index in duplicate_indices]
+        
+        # Specialize the date parser on the first available sample before parsing the column
+        self.adapt_parser(next((value for value in last_reports if value), None))
+        dates = dict(zip(duplicate_indices, self._parse_date_column(last_reports)))
+        
+        # Unpack to the "<mac>_<os type>" composite keys used by the report code; each group
+        # is sorted once and shared by identification and reporting
+        return {f"{key >> 2:012x}_{_OS_TYPES[key & 3]}": self._build_sorted_devices(indices, metas, dates)
+                for key, indices in index_groups.items()}
+    
+    def _build_columns(self, computers: List[Dict]) -> Tuple[List[int], List[Dict]]:
+        """Split computers with a valid MAC into parallel columns of packed keys and source dicts"""
+        mac_keys = []
+        metas = []
         
         for computer in computers:
             system_mac = computer.get('system_mac_address')
-            os_version = computer.get('os_version', '')
             
             # Skip computers without system MAC address
-            if not system_mac or system_mac.strip() == '':
+            if not system_mac:
                 continue
                 
-            # Normalize MAC address (remove colons, hyphens, make lowercase)
-            normalized_mac = system_mac.replace(':', '').replace('-', '').lower().strip()
+            # Normalize MAC address (drop separators/whitespace in one pass, make lowercase)
+            normalized_mac = system_mac.translate(_MAC_STRIP).lower()
             
-            # Skip invalid MAC addresses
-            if len(normalized_mac) != 12:
+            # Skip invalid MAC addresses; int(..., 16) alone would also accept '0x' and '+' prefixes
+            if len(normalized_mac) != 12 or not _HEX_DIGITS.issuperset(normalized_mac):
                 continue
+            mac_value = int(normalized_mac, 16)
             
             # Determine OS type from os_version string
-            os_type = self._get_os_type(os_version)
+            os_type = self._get_os_type(computer.get('os_version', ''))
             
-            # Create composite key: MAC + OS Type
-            composite_key = f"{normalized_mac}_{os_type}"
-            mac_os_groups[composite_key].append(computer)
+            # Pack MAC (48 bits) + OS type into one int key; ints hash faster than strings
+            mac_keys.append((mac_value << 2) | _OS_TYPE_INDEX[os_type])
+            metas.append(computer)
+        
+        return mac_keys, metas
+    
+    @staticmethod
+    def _group_duplicate_indices(mac_keys: List[int]) -> Dict[int, List[int]]:
+        """Map each key that occurs more than once to the column indices holding it"""
+        # Count first so lists are only built for keys that are actually duplicated
+        counts = Counter(mac_keys)
+        
+        index_groups = {}
+        for index, key in enumerate(mac_keys):
+            if counts[key] > 1:
+                indices = index_groups.get(key)
+                if indices is None:
+                    index_groups[key] = [index]
+                else:
+                    indices.append(index)
+        
+        return index_groups
+    
+    def _parse_date_column(self, last_reports: List) -> List[datetime]:
+        """Parse a column of last_report values, using UNKNOWN_REPORT_DATE for missing ones"""
+        parse_last = self._parse_last
+        
+        # Parse each distinct scalar once, as a numpy batch when the column is large enough.
+        # Other values (e.g. a list from a malformed record) can't be hashed and go to the
+        # parser one by one.
+        distinct = [value for value in dict.fromkeys(value for value in last_reports
+                                                     if isinstance(value, (str, int, float)))
+                    if value]
+        parsed = self._parse_utc_column_numpy(distinct) if len(distinct) >= NUMPY_DATE_COLUMN_MIN else None
+        
+        if parsed is None:
+            parsed = {value: parse_last(value) for value in distinct}
+        
+        return [(parsed.get(value) if isinstance(value, (str, int, float)) else parse_last(value))
+                or UNKNOWN_REPORT_DATE
+                for value in last_reports]
+    
+    @staticmethod
+    def _parse_utc_column_numpy(values: List) -> Optional[Dict]:
+        """
+        Parse UTC ISO-8601 strings ('...Z') in one numpy call
+        
+        Returns None if the column doesn't qualify or numpy isn't installed.
+        """
+        if not values or not all(isinstance(value, str) and value.endswith('Z') and 'T' in value for value in values):
+            return None
+        
+        try:
+            import numpy as np
+        except ImportError:
+            return None
+        
+        try:
+            # Strip the 'Z' so numpy parses naive UTC without its timezone deprecation warning
+            parsed = np.array([value[:-1] for value in values], dtype='datetime64[us]').tolist()
+        except ValueError:
+            return None
         
-        # Filter to only groups with duplicates
-        duplicates = {key: computers for key, computers in mac_os_groups.items() if len(computers) > 1}
+        if not all(isinstance(date, datetime) for date in parsed):
+            return None
+        return dict(zip(values, parsed))
+    
+    def _build_sorted_devices(self, indices: List[int], metas: List[Dict], dates: Dict[int, datetime]) -> List[Device]:
+        """Build a Device for each indexed computer, sorted by last_report date newest first"""
+        # map() runs every dict.get in C rather than one Python-level call per field
+        devices = [Device(*map(metas[index].get, _DEVICE_INFO_KEYS, _DEVICE_INFO_DEFAULTS), dates[index])
+                   for index in indices]
         
-        return duplicates
+        # Sort by date (newest first, unknown dates last); attrgetter avoids a Python-level key call
+        devices.sort(key=attrgetter('parsed_date'), reverse=True)
+        return devices
     
     def _get_os_type(self, os_version: str) -> str:
         """Extract OS type from os_version string"""
@@ -202,53 +523,90 @@ class DuplicateReporter:
         # Default to unknown for anything else
         return 'unknown'
     
-    def identify_devices_to_remove(self, duplicate_groups: Dict[str, List[Dict]]) -> List[Tuple[Dict, str]]:
+    def identify_devices_to_remove(self, duplicate_groups: Dict[str, List[Device]]) -> List[Tuple[Device, str]]:
         """Identify which devices should be removed (oldest last_report dates)"""
         devices_to_remove = []
         
-        for composite_key, computers in duplicate_groups.items():
+        for composite_key, devices in duplicate_groups.items():
             # Parse the composite key to get MAC and OS type
             mac_address, os_type = composite_key.rsplit('_', 1)
             
             print(f"\n--- Analyzing duplicates for MAC: {mac_address} (OS: {os_type.upper()}) ---")
             
-            # Parse and sort by last_report date
-            computer_dates = []
-            for computer in computers:
-                last_report_date = self.parse_last_report(computer.get('last_report'))
-                computer_dates.append((computer, last_report_date))
-                
-                print(f"  {computer.get('computer_name', 'Unknown')} ({computer.get('client_id', 'Unknown ID')}) - "
-                      f"OS: {computer.get('os_version', 'Unknown')} - "
-                      f"Last Report: {last_report_date if last_report_date else 'Unknown'}")
-            
-            # Sort by date (newest first, None dates last)
-            computer_dates.sort(key=lambda x: x[1] if x[1] is not None else datetime.min, reverse=True)
+            # Groups arrive already sorted newest first
+            for device in devices:
+                print(f"  {device.computer_name} ({device.client_id}) - "
+                      f"OS: {device.os_version} - "
+                      f"Last Report: {device.parsed_date.replace(microsecond=0) if device.parsed_date != UNKNOWN_REPORT_DATE else 'Unknown'}")
             
             # Keep the first (newest) computer, mark others for removal
-            if len(computer_dates) > 1:
-                keeper = computer_dates[0]
-                to_remove = computer_dates[1:]
+            if len(devices) > 1:
+                keeper = devices[0]
+                to_remove = devices[1:]
                 
-                print(f"  → KEEPING: {keeper[0].get('computer_name', 'Unknown')} ({keeper[0].get('client_id', 'Unknown ID')})")
+                print(f"  → KEEPING: {keeper.computer_name} ({keeper.client_id})")
                 
-                for computer, date in to_remove:
+                for device in to_remove:
                     reason = f"Duplicate MAC {mac_address} with same OS type ({os_type.upper()}), older report date"
-                    devices_to_remove.append((computer, reason))
-                    print(f"  → REMOVING: {computer.get('computer_name', 'Unknown')} ({computer.get('client_id', 'Unknown ID')}) - {reason}")
+                    devices_to_remove.append((device, reason))
+                    print(f"  → REMOVING: {device.computer_name} ({device.client_id}) - {reason}")
         
         return devices_to_remove
     
-    def generate_report(self, devices_to_remove: List[Tuple[Dict, str]], duplicate_groups: Dict[str, List[Dict]]) -> Dict:
+    def build_results_unified(self, duplicate_groups: Dict[str, List[Device]], csv_writer=None) -> ReportResults:
+        """
+        Build the report results (summary counts, keep/remove lists and per-group detail)
+        
+        Does no printing, so it serves both the console report and --email-only runs.
+        When csv_writer is given (see csv_export), each group's CSV rows are written
+        in the same pass.
+        """
+        devices_to_keep = []
+        devices_to_remove = []
+        duplicate_groups_detail = []
+        
+        # Bound once; the loop below runs per duplicate group
+        keep_append = devices_to_keep.append
+        remove_extend = devices_to_remove.extend
+        detail_append = duplicate_groups_detail.append
+        csv_row = self._csv_row
+        
+        for composite_key, devices in duplicate_groups.items():
+            # Parse the composite key to get MAC and OS type
+            mac_address, os_type = composite_key.rsplit('_', 1)
+            
+            # Groups arrive sorted newest first, so the keeper is always index 0
+            keeper = _device_info(devices[0])
+            to_remove = [_device_info(device) for device in devices[1:]]
+            
+            keep_append(keeper)
+            remove_extend(to_remove)
+            
+            if csv_writer is not None:
+                csv_writer.writerow(csv_row('KEEP', keeper, 'Most recent report date'))
+                csv_writer.writerows(csv_row('REMOVE', device, 'Older report date (same MAC + OS type)')
+                                     for device in to_remove)
+            
+            detail_append({
+                'mac_address': mac_address,
+                'os_type': os_type.upper(),
+                'total_devices': len(devices),
+                'device_to_keep': keeper,
+                'devices_to_remove': to_remove
+            })
+        
+        return ReportResults(
+            total_duplicate_groups=len(duplicate_groups),
+            total_duplicate_devices=sum(map(len, duplicate_groups.values())),
+            devices_to_keep=devices_to_keep,
+            devices_to_remove=devices_to_remove,
+            duplicate_groups_detail=duplicate_groups_detail
+        )
+    
+    def generate_report(self, devices_to_remove: List[Tuple[Device, str]], duplicate_groups: Dict[str, List[Device]],
+                        csv_writer=None) -> ReportResults:
         """Generate a comprehensive duplicate devices report"""
-        results = {
-            'total_computers_analyzed': 0,
-            'total_duplicate_groups': len(duplicate_groups),
-            'total_duplicate_devices': sum(len(computers) for computers in duplicate_groups.values()),
-            'devices_to_keep': [],
-            'devices_to_remove': [],
-            'duplicate_groups_detail': []
-        }
+        results = self.build_results_unified(duplicate_groups, csv_writer)
         
         if not devices_to_remove and not duplicate_groups:
             print("✅ No duplicate devices found.")
@@ -257,130 +615,74 @@ class DuplicateReporter:
         print(f"\n📊 DUPLICATE DEVICES REPORT")
         print("=" * 60)
         print(f"Found {len(duplicate_groups)} groups with duplicate MAC addresses")
-        print(f"Total duplicate devices: {results['total_duplicate_devices']}")
+        print(f"Total duplicate devices: {results.total_duplicate_devices}")
         print(f"Devices that should be removed: {len(devices_to_remove)}")
         print()
         
-        # Process each duplicate group
-        for composite_key, computers in duplicate_groups.items():
-            # Parse the composite key to get MAC and OS type
-            mac_address, os_type = composite_key.rsplit('_', 1)
-            
-            print(f"🔍 MAC Address: {mac_address} (OS Type: {os_type.upper()})")
+        # Print each duplicate group
+        for group in results.duplicate_groups_detail:
+            print(f"🔍 MAC Address: {group['mac_address']} (OS Type: {group['os_type']})")
             print("-" * 50)
             
-            # Parse and sort by last_report date
-            computer_dates = []
-            for computer in computers:
-                last_report_date = self.parse_last_report(computer.get('last_report'))
-                computer_dates.append((computer, last_report_date))
-            
-            # Sort by date (newest first, None dates last)
-            computer_dates.sort(key=lambda x: x[1] if x[1] is not None else datetime.min, reverse=True)
+            device_info = group['device_to_keep']
+            print(f"   ✅ KEEP: {device_info['computer_name']} ({device_info['client_id']})")
+            print(f"      Last Report: {device_info['last_report_parsed']}")
+            print(f"      Serial: {device_info['serial_number']}")
+            print(f"      OS: {device_info['os_version']}")
+            print(f"      URL: {device_info['computer_url']}")
+            print()
             
-            group_detail = {
-                'mac_address': mac_address,
-                'os_type': os_type.upper(),
-                'total_devices': len(computers),
-                'device_to_keep': None,
-                'devices_to_remove': []
-            }
-            
-            # Process each device in the group
-            for i, (computer, date) in enumerate(computer_dates):
-                device_info = {
-                    'computer_name': computer.get('computer_name', 'Unknown'),
-                    'client_id': computer.get('client_id', 'Unknown'),
-                    'uid': computer.get('uid', 'Unknown'),
-                    'last_report': computer.get('last_report'),
-                    'last_report_parsed': date.isoformat() if date else 'Unknown',
-                    'group': computer.get('group', 'Unknown'),
-                    'serial_number': computer.get('serial_number', 'Unknown'),
-                    'os_version': computer.get('os_version', 'Unknown'),
-                    'computer_url': computer.get('computer_url', 'N/A')
-                }
-                
-                if i == 0:  # Keep the first (newest)
-                    print(f"   ✅ KEEP: {device_info['computer_name']} ({device_info['client_id']})")
-                    print(f"      Last Report: {device_info['last_report_parsed']}")
-                    print(f"      Serial: {device_info['serial_number']}")
-                    print(f"      OS: {device_info['os_version']}")
-                    print(f"      URL: {device_info['computer_url']}")
-                    
-                    group_detail['device_to_keep'] = device_info
-                    results['devices_to_keep'].append(device_info)
-                else:  # Mark others for removal
-                    print(f"   ❌ REMOVE: {device_info['computer_name']} ({device_info['client_id']})")
-                    print(f"      Last Report: {device_info['last_report_parsed']}")
-                    print(f"      Serial: {device_info['serial_number']}")
-                    print(f"      OS: {device_info['os_version']}")
-                    print(f"      URL: {device_info['computer_url']}")
-                    print(f"      Reason: Older report date than keeper (same OS type: {os_type.upper()})")
-                    
-                    group_detail['devices_to_remove'].append(device_info)
-                    results['devices_to_remove'].append(device_info)
-                
+            for device_info in group['devices_to_remove']:
+                print(f"   ❌ REMOVE: {device_info['computer_name']} ({device_info['client_id']})")
+                print(f"      Last Report: {device_info['last_report_parsed']}")
+                print(f"      Serial: {device_info['serial_number']}")
+                print(f"      OS: {device_info['os_version']}")
+                print(f"      URL: {device_info['computer_url']}")
+                print(f"      Reason: Older report date than keeper (same OS type: {group['os_type']})")
                 print()
             
-            results['duplicate_groups_detail'].append(group_detail)
             print()
         
         return results
     
-    def export_report_to_csv(self, results: Dict, filename: str = 'watchman_duplicates_report.csv'):
+    def export_report_to_csv(self, results: ReportResults, filename: str = DEFAULT_CSV_FILENAME):
         """Export the duplicate report to a CSV file"""
-        try:
-            import csv
-            
-            with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
-                fieldnames = [
-                    'Status', 'MAC_Address', 'Computer_Name', 'Client_ID', 'UID',
-                    'Last_Report', 'Serial_Number', 'OS_Version', 'Group',
-                    'Computer_URL', 'Reason'
-                ]
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                writer.writeheader()
-                
-                # Write devices to keep
-                for device in results['devices_to_keep']:
-                    writer.writerow({
-                        'Status': 'KEEP',
-                        'MAC_Address': 'See group detail',
-                        'Computer_Name': device['computer_name'],
-                        'Client_ID': device['client_id'],
-                        'UID': device['uid'],
-                        'Last_Report': device['last_report_parsed'],
-                        'Serial_Number': device['serial_number'],
-                        'OS_Version': device['os_version'],
-                        'Group': device['group'],
-                        'Computer_URL': device['computer_url'],
-                        'Reason': 'Most recent report date'
-                    })
-                
-                # Write devices to remove
-                for device in results['devices_to_remove']:
-                    writer.writerow({
-                        'Status': 'REMOVE',
-                        'MAC_Address': 'See group detail',
-                        'Computer_Name': device['computer_name'],
-                        'Client_ID': device['client_id'],
-                        'UID': device['uid'],
-                        'Last_Report': device['last_report_parsed'],
-                        'Serial_Number': device['serial_number'],
-                        'OS_Version': device['os_version'],
-                        'Group': device['group'],
-                        'Computer_URL': device['computer_url'],
-                        'Reason': 'Older report date (same MAC + OS type)'
-                    })
-            
-            print(f"📄 Report exported to: {filename}")
+        # Nothing to export; avoid writing a header-only report file
+        if not (results.devices_to_keep or results.devices_to_remove):
             return True
-            
-        except Exception as e:
-            print(f"❌ Failed to export CSV: {e}")
-            return False
+        
+        with self.csv_export(filename) as csv_writer:
+            # Stream keep rows then remove rows through a single writerows call
+            keep_rows = (self._csv_row('KEEP', device, 'Most recent report date')
+                         for device in results.devices_to_keep)
+            remove_rows = (self._csv_row('REMOVE', device, 'Older report date (same MAC + OS type)')
+                           for device in results.devices_to_remove)
+            csv_writer.writerows(chain(keep_rows, remove_rows))
+        
+        return csv_writer.ok
+
+    def csv_export(self, filename: str = DEFAULT_CSV_FILENAME) -> 'CsvReportWriter':
+        """Context manager streaming CSV report rows to filename while results are built"""
+        return CsvReportWriter(filename)
 
-    def remove_duplicates(self, devices_to_remove: List[Tuple[Dict, str]], dry_run: bool = True) -> Dict:
+    @staticmethod
+    def _csv_row(status: str, device: Dict, reason: str) -> Tuple:
+        """Build a CSV row in CSV_FIELDNAMES order"""
+        return (
+            status,
+            'See group detail',
+            device['computer_name'],
+            device['client_id'],
+            device['uid'],
+            device['last_report_parsed'],
+            device['serial_number'],
+            device['os_version'],
+            device['group'],
+            device['computer_url'],
+            reason
+        )
+
+    def remove_duplicates(self, devices_to_remove: List[Tuple[Device, str]], dry_run: bool = True) -> Dict:
         """Generate report instead of removing duplicates (API doesn't support deletion)"""
         results = {
             'total_to_remove': len(devices_to_remove),
@@ -406,18 +708,137 @@ class DuplicateReporter:
         
         return results
 
+class CsvReportWriter:
+    """
+    Context manager that streams rows into a CSV report file
+    
+    Export failures (opening, writing or flushing the file) are reported once and
+    turn later writes into no-ops, so a bad export never interrupts the report or
+    the email. Check ok after the with block to see whether the file is complete.
+    """
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.ok = False
+        self._error = None
+        self._file = None
+        self._writer = None
+    
+    def __enter__(self):
+        import csv
+        
+        try:
+            # Large buffer so per-row writes reach the OS in a few big chunks
+            self._file = open(self.filename, 'w', newline='', encoding='utf-8', buffering=1 << 20)
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(CSV_FIELDNAMES)
+            self.ok = True
+        except (OSError, UnicodeError) as e:
+            self._fail(e)
+        return self
+    
+    def writerow(self, row):
+        if self.ok:
+            try:
+                self._writer.writerow(row)
+            except (OSError, UnicodeError) as e:
+                self._fail(e)
+    
+    def writerows(self, rows):
+        if self.ok:
+            try:
+                self._writer.writerows(rows)
+            except (OSError, UnicodeError) as e:
+                self._fail(e)
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self._file is not None:
+            try:
+                self._file.close()
+            except (OSError, UnicodeError) as e:
+                self._fail(e)
+        
+        if self.ok and exc_type is None:
+            print(f"📄 Report exported to: {self.filename}")
+        return False
+    
+    def _fail(self, error: Exception):
+        """Report the first export failure and stop writing"""
+        if self._error is None:
+            print(f"❌ Failed to export CSV: {error}")
+        self._error = error
+        self.ok = False
+
+# Static head (styles and title) and closing blocks of the HTML email report
+_HTML_PREAMBLE = """
+        <!DOCTYPE html>
+        <html>
+        <head>
+            <style>
+                body { font-family: Arial, sans-serif; margin: 20px; }
+                .header { background-color: #f8f9fa; padding: 20px; border-radius: 5px; margin-bottom: 20px; }
+                .summary { background-color: #e9ecef; padding: 15px; border-radius: 5px; margin-bottom: 20px; }
+                .group { margin-bottom: 30px; border: 1px solid #dee2e6; border-radius: 5px; padding: 15px; }
+                .group-header { background-color: #007bff; color: white; padding: 10px; margin: -15px -15px 15px -15px; border-radius: 4px 4px 0 0; }
+                .device { margin: 10px 0; padding: 10px; border-radius: 3px; }
+                .keep { background-color: #d4edda; border-left: 4px solid #28a745; }
+                .remove { background-color: #f8d7da; border-left: 4px solid #dc3545; }
+                .device-info { margin: 5px 0; }
+                .url { color: #007bff; text-decoration: none; }
+                .url:hover { text-decoration: underline; }
+            </style>
+        </head>
+        <body>
+            <div class="header">
+                <h1>🎯 Watchman Duplicate Devices Report</h1>"""
+
+_HTML_EPILOGUE = """
+            <div class="summary">
+                <h3>💡 Next Steps</h3>
+                <ol>
+                    <li>Review the devices marked as <strong style="color: #dc3545;">REMOVE</strong> above</li>
+                    <li>Click the "Remove in Watchman" links to navigate to each device</li>
+                    <li>Use Watchman's web interface to manually remove the older duplicates</li>
+                    <li>Keep devices marked as <strong style="color: #28a745;">KEEP</strong> (most recent activity)</li>
+                </ol>
+                <p><em>Note: The Watchman API does not support automatic device removal, so manual removal through the web interface is required.</em></p>
+            </div>
+        </body>
+        </html>
+        """
+
+_HTML_NO_DUPLICATES = """
+            <div class="summary">
+                <p>✅ No duplicate devices found.</p>
+            </div>
+        </body>
+        </html>
+        """
+
 class EmailReporter:
     def __init__(self, config: Dict):
         self.config = config
-        self.smtp_configured = bool(config.get('smtp_server'))
+        self.smtp_configured = self.is_configured(config)
     
-    def send_report_email(self, results: Dict, csv_filename: str = None) -> bool:
+    @staticmethod
+    def is_configured(config: Dict) -> bool:
+        """Whether config has the SMTP settings needed to send reports"""
+        return bool(config.get('smtp_server'))
+    
+    def send_report_email(self, results: ReportResults, csv_filename: str = None) -> bool:
         """Send the duplicate report via email"""
         if not self.smtp_configured:
             print("❌ Email not configured. Skipping email send.")
             return False
         
         try:
+            # Imported here so runs that never send mail skip loading the SMTP and MIME modules
+            import smtplib
+            import ssl
+            from email.mime.text import MIMEText
+            from email.mime.multipart import MIMEMultipart
+            from email.mime.base import MIMEBase
+            from email import encoders
+            
             # Create email content
             subject = f"Watchman Duplicate Devices Report - {datetime.now().strftime('%Y-%m-%d %H:%M')}"
             
@@ -470,29 +891,9 @@ class EmailReporter:
             print(f"❌ Failed to send email: {e}")
             return False
     
-    def _create_html_report(self, results: Dict) -> str:
+    def _create_html_report(self, results: ReportResults) -> str:
         """Create HTML formatted email report"""
-        html = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <style>
-                body {{ font-family: Arial, sans-serif; margin: 20px; }}
-                .header {{ background-color: #f8f9fa; padding: 20px; border-radius: 5px; margin-bottom: 20px; }}
-                .summary {{ background-color: #e9ecef; padding: 15px; border-radius: 5px; margin-bottom: 20px; }}
-                .group {{ margin-bottom: 30px; border: 1px solid #dee2e6; border-radius: 5px; padding: 15px; }}
-                .group-header {{ background-color: #007bff; color: white; padding: 10px; margin: -15px -15px 15px -15px; border-radius: 4px 4px 0 0; }}
-                .device {{ margin: 10px 0; padding: 10px; border-radius: 3px; }}
-                .keep {{ background-color: #d4edda; border-left: 4px solid #28a745; }}
-                .remove {{ background-color: #f8d7da; border-left: 4px solid #dc3545; }}
-                .device-info {{ margin: 5px 0; }}
-                .url {{ color: #007bff; text-decoration: none; }}
-                .url:hover {{ text-decoration: underline; }}
-            </style>
-        </head>
-        <body>
-            <div class="header">
-                <h1>🎯 Watchman Duplicate Devices Report</h1>
+        parts = [_HTML_PREAMBLE, f"""
                 <p><strong>Generated:</strong> {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>
                 <p><strong>Subdomain:</strong> {self.config.get('subdomain', 'N/A')}</p>
             </div>
@@ -500,31 +901,31 @@ class EmailReporter:
             <div class="summary">
                 <h2>📊 Summary</h2>
                 <ul>
-                    <li><strong>Duplicate Groups Found:</strong> {results.get('total_duplicate_groups', 0)}</li>
-                    <li><strong>Total Duplicate Devices:</strong> {results.get('total_duplicate_devices', 0)}</li>
-                    <li><strong>Devices to Keep:</strong> {len(results.get('devices_to_keep', []))}</li>
-                    <li><strong>Devices to Remove:</strong> {len(results.get('devices_to_remove', []))}</li>
+                    <li><strong>Duplicate Groups Found:</strong> {results.total_duplicate_groups}</li>
+                    <li><strong>Total Duplicate Devices:</strong> {results.total_duplicate_devices}</li>
+                    <li><strong>Devices to Keep:</strong> {len(results.devices_to_keep)}</li>
+                    <li><strong>Devices to Remove:</strong> {len(results.devices_to_remove)}</li>
                 </ul>
             </div>
-        """
+        """]
         
-        if results.get('duplicate_groups_detail'):
-            html += "<h2>📋 Detailed Groups</h2>"
+        if results.duplicate_groups_detail:
+            parts.append("<h2>📋 Detailed Groups</h2>")
             
-            for group in results['duplicate_groups_detail']:
-                html += f"""
+            for group in results.duplicate_groups_detail:
+                parts.append(f"""
                 <div class="group">
                     <div class="group-header">
                         <strong>MAC Address:</strong> {group['mac_address']} 
                         <strong>OS Type:</strong> {group['os_type']}
                         ({group['total_devices']} devices)
                     </div>
-                """
+                """)
                 
                 # Device to keep
                 if group.get('device_to_keep'):
                     device = group['device_to_keep']
-                    html += f"""
+                    parts.append(f"""
                     <div class="device keep">
                         <strong>✅ KEEP:</strong> {device['computer_name']} ({device['client_id']})
                         <div class="device-info"><strong>Last Report:</strong> {device['last_report_parsed']}</div>
@@ -532,11 +933,11 @@ class EmailReporter:
                         <div class="device-info"><strong>OS:</strong> {device['os_version']}</div>
                         <div class="device-info"><a href="{device['computer_url']}" class="url">View in Watchman →</a></div>
                     </div>
-                    """
+                    """)
                 
                 # Devices to remove
                 for device in group.get('devices_to_remove', []):
-                    html += f"""
+                    parts.append(f"""
                     <div class="device remove">
                         <strong>❌ REMOVE:</strong> {device['computer_name']} ({device['client_id']})
                         <div class="device-info"><strong>Last Report:</strong> {device['last_report_parsed']}</div>
@@ -544,30 +945,21 @@ class EmailReporter:
                         <div class="device-info"><strong>OS:</strong> {device['os_version']}</div>
                         <div class="device-info"><a href="{device['computer_url']}" class="url">Remove in Watchman →</a></div>
                     </div>
-                    """
+                    """)
                 
-                html += "</div>"
+                parts.append("</div>")
+        else:
+            # Nothing to list; skip the removal steps as well
+            parts.append(_HTML_NO_DUPLICATES)
+            return ''.join(parts)
         
-        html += """
-            <div class="summary">
-                <h3>💡 Next Steps</h3>
-                <ol>
-                    <li>Review the devices marked as <strong style="color: #dc3545;">REMOVE</strong> above</li>
-                    <li>Click the "Remove in Watchman" links to navigate to each device</li>
-                    <li>Use Watchman's web interface to manually remove the older duplicates</li>
-                    <li>Keep devices marked as <strong style="color: #28a745;">KEEP</strong> (most recent activity)</li>
-                </ol>
-                <p><em>Note: The Watchman API does not support automatic device removal, so manual removal through the web interface is required.</em></p>
-            </div>
-        </body>
-        </html>
-        """
+        parts.append(_HTML_EPILOGUE)
         
-        return html
+        return ''.join(parts)
     
-    def _create_text_report(self, results: Dict) -> str:
+    def _create_text_report(self, results: ReportResults) -> str:
         """Create plain text email report"""
-        text = f"""
+        parts = [f"""
 WATCHMAN DUPLICATE DEVICES REPORT
 ================================
 
@@ -576,42 +968,45 @@ Subdomain: {self.config.get('subdomain', 'N/A')}
 
 SUMMARY
 -------
-Duplicate Groups Found: {results.get('total_duplicate_groups', 0)}
-Total Duplicate Devices: {results.get('total_duplicate_devices', 0)}
-Devices to Keep: {len(results.get('devices_to_keep', []))}
-Devices to Remove: {len(results.get('devices_to_remove', []))}
+Duplicate Groups Found: {results.total_duplicate_groups}
+Total Duplicate Devices: {results.total_duplicate_devices}
+Devices to Keep: {len(results.devices_to_keep)}
+Devices to Remove: {len(results.devices_to_remove)}
 
-"""
+"""]
         
-        if results.get('duplicate_groups_detail'):
-            text += "DETAILED GROUPS\n"
-            text += "---------------\n\n"
+        if results.duplicate_groups_detail:
+            parts.append("DETAILED GROUPS\n"
+                         "---------------\n\n")
             
-            for group in results['duplicate_groups_detail']:
-                text += f"MAC Address: {group['mac_address']} | OS Type: {group['os_type']} ({group['total_devices']} devices)\n"
-                text += "-" * 60 + "\n"
+            for group in results.duplicate_groups_detail:
+                parts.append(f"MAC Address: {group['mac_address']} | OS Type: {group['os_type']} ({group['total_devices']} devices)\n"
+                             + "-" * 60 + "\n")
                 
                 # Device to keep
                 if group.get('device_to_keep'):
                     device = group['device_to_keep']
-                    text += f"✅ KEEP: {device['computer_name']} ({device['client_id']})\n"
-                    text += f"   Last Report: {device['last_report_parsed']}\n"
-                    text += f"   Serial: {device['serial_number']}\n"
-                    text += f"   OS: {device['os_version']}\n"
-                    text += f"   URL: {device['computer_url']}\n\n"
+                    parts.append(f"✅ KEEP: {device['computer_name']} ({device['client_id']})\n"
+                                 f"   Last Report: {device['last_report_parsed']}\n"
+                                 f"   Serial: {device['serial_number']}\n"
+                                 f"   OS: {device['os_version']}\n"
+                                 f"   URL: {device['computer_url']}\n\n")
                 
                 # Devices to remove
                 for device in group.get('devices_to_remove', []):
-                    text += f"❌ REMOVE: {device['computer_name']} ({device['client_id']})\n"
-                    text += f"   Last Report: {device['last_report_parsed']}\n"
-                    text += f"   Serial: {device['serial_number']}\n"
-                    text += f"   OS: {device['os_version']}\n"
-                    text += f"   URL: {device['computer_url']}\n"
-                    text += f"   Reason: Older report date than keeper\n\n"
+                    parts.append(f"❌ REMOVE: {device['computer_name']} ({device['client_id']})\n"
+                                 f"   Last Report: {device['last_report_parsed']}\n"
+                                 f"   Serial: {device['serial_number']}\n"
+                                 f"   OS: {device['os_version']}\n"
+                                 f"   URL: {device['computer_url']}\n"
+                                 f"   Reason: Older report date than keeper\n\n")
                 
-                text += "\n"
+                parts.append("\n")
+        else:
+            parts.append("No duplicate devices found.\n")
+            return ''.join(parts)
         
-        text += """
+        parts.append("""
 NEXT STEPS
 ----------
 1. Review the devices marked as 'REMOVE' above
@@ -621,9 +1016,33 @@ NEXT STEPS
 
 Note: The Watchman API does not support automatic device removal, 
 so manual removal through the web interface is required.
-"""
+""")
         
-        return text
+        return ''.join(parts)
+
+@lru_cache(maxsize=4)
+def _parse_env(path: str, mtime_ns: int) -> Dict:
+    """
+    Parse a .env file into config fields
+    
+    Cached on (path, mtime_ns) so repeated loads of an unchanged file skip the
+    read and regex pass; editing the file changes its mtime and forces a re-parse.
+    """
+    with open(path, 'r') as f:
+        env_values = dict(_ENV_LINE_RE.findall(f.read()))
+    
+    config = {}
+    for env_key, config_key in _ENV_FIELDS.items():
+        if env_key not in env_values:
+            continue
+        value = env_values[env_key]
+        if config_key == 'smtp_port':
+            config[config_key] = int(value)
+        elif config_key == 'smtp_use_tls':
+            config[config_key] = value.lower() in ['true', '1', 'yes']
+        else:
+            config[config_key] = value
+    return config
 
 def load_or_create_env():
     """
@@ -637,30 +1056,10 @@ def load_or_create_env():
     # Try to read existing .env file
     if os.path.exists(env_file):
         print("📄 Found .env file, loading configuration...")
-        config = {}
         
         try:
-            with open(env_file, 'r') as f:
-                for line in f:
-                    line = line.strip()
-                    if line.startswith('WATCHMAN_SUBDOMAIN='):
-                        config['subdomain'] = line.split('=', 1)[1].strip()
-                    elif line.startswith('WATCHMAN_API_KEY='):
-                        config['api_key'] = line.split('=', 1)[1].strip()
-                    elif line.startswith('SMTP_SERVER='):
-                        config['smtp_server'] = line.split('=', 1)[1].strip()
-                    elif line.startswith('SMTP_PORT='):
-                        config['smtp_port'] = int(line.split('=', 1)[1].strip())
-                    elif line.startswith('SMTP_USERNAME='):
-                        config['smtp_username'] = line.split('=', 1)[1].strip()
-                    elif line.startswith('SMTP_PASSWORD='):
-                        config['smtp_password'] = line.split('=', 1)[1].strip()
-                    elif line.startswith('EMAIL_FROM='):
-                        config['email_from'] = line.split('=', 1)[1].strip()
-                    elif line.startswith('EMAIL_TO='):
-                        config['email_to'] = line.split('=', 1)[1].strip()
-                    elif line.startswith('SMTP_USE_TLS='):
-                        config['smtp_use_tls'] = line.split('=', 1)[1].strip().lower() in ['true', '1', 'yes']
+            # Copy so callers can't mutate the cached parse
+            config = dict(_parse_env(env_file, os.stat(env_file).st_mtime_ns))
             
             # Check required Watchman fields
             if config.get('subdomain') and config.get('api_key'):
@@ -677,18 +1076,18 @@ def load_or_create_env():
             print(f"❌ Error reading .env file: {e}")
     
     # Create new .env file
-    print("\n🔧 .env file not found or incomplete. Let's create one!")
-    print("You'll need your Watchman Monitoring credentials:\n")
-    
-    print("=== WATCHMAN CONFIGURATION (Required) ===")
-    print("1. Subdomain: This is the part before '.monitoringclient.com' in your URL")
-    print("   Example: If your URL is 'https://mycompany.monitoringclient.com'")
-    print("   Then your subdomain is: mycompany")
+    # Static prompt text is written one block at a time
+    sys.stdout.write("\n🔧 .env file not found or incomplete. Let's create one!\n"
+                     "You'll need your Watchman Monitoring credentials:\n\n"
+                     "=== WATCHMAN CONFIGURATION (Required) ===\n"
+                     "1. Subdomain: This is the part before '.monitoringclient.com' in your URL\n"
+                     "   Example: If your URL is 'https://mycompany.monitoringclient.com'\n"
+                     "   Then your subdomain is: mycompany\n")
     subdomain = input("\nEnter your subdomain: ").strip()
     
-    print("\n2. API Key: Get this from your Watchman dashboard")
-    print("   Go to: Settings > API in your Watchman dashboard")
-    print("   Generate or copy your API key")
+    sys.stdout.write("\n2. API Key: Get this from your Watchman dashboard\n"
+                     "   Go to: Settings > API in your Watchman dashboard\n"
+                     "   Generate or copy your API key\n")
     api_key = input("\nEnter your API key: ").strip()
     
     if not subdomain or not api_key:
@@ -700,17 +1099,17 @@ def load_or_create_env():
     }
     
     # Optional email configuration
-    print("\n=== EMAIL CONFIGURATION (Optional) ===")
-    print("Configure email settings to send reports automatically.")
+    sys.stdout.write("\n=== EMAIL CONFIGURATION (Optional) ===\n"
+                     "Configure email settings to send reports automatically.\n")
     setup_email = input("Do you want to configure email sending? (y/n): ").strip().lower()
     
     if setup_email in ['y', 'yes']:
-        print("\nEmail Configuration:")
-        print("Common SMTP settings:")
-        print("  Gmail: smtp.gmail.com, port 587, TLS enabled")
-        print("  Outlook: smtp-mail.outlook.com, port 587, TLS enabled")
-        print("  Yahoo: smtp.mail.yahoo.com, port 587, TLS enabled")
-        print("  Office 365: smtp.office365.com, port 587, TLS enabled")
+        sys.stdout.write("\nEmail Configuration:\n"
+                         "Common SMTP settings:\n"
+                         "  Gmail: smtp.gmail.com, port 587, TLS enabled\n"
+                         "  Outlook: smtp-mail.outlook.com, port 587, TLS enabled\n"
+                         "  Yahoo: smtp.mail.yahoo.com, port 587, TLS enabled\n"
+                         "  Office 365: smtp.office365.com, port 587, TLS enabled\n")
         
         smtp_server = input("\nSMTP Server (e.g., smtp.gmail.com): ").strip()
         smtp_port = input("SMTP Port (usually 587 or 465): ").strip()
@@ -736,22 +1135,27 @@ def load_or_create_env():
     
     # Save to .env file
     try:
-        with open(env_file, 'w') as f:
-            f.write(f"# Watchman Monitoring Configuration\n")
-            f.write(f"# Created automatically by duplicate report script\n\n")
-            f.write(f"# Watchman API Settings (Required)\n")
-            f.write(f"WATCHMAN_SUBDOMAIN={config['subdomain']}\n")
-            f.write(f"WATCHMAN_API_KEY={config['api_key']}\n\n")
-            
-            if config.get('smtp_server'):
-                f.write(f"# Email Settings (Optional)\n")
-                f.write(f"SMTP_SERVER={config['smtp_server']}\n")
-                f.write(f"SMTP_PORT={config['smtp_port']}\n")
-                f.write(f"SMTP_USERNAME={config['smtp_username']}\n")
-                f.write(f"SMTP_PASSWORD={config['smtp_password']}\n")
-                f.write(f"EMAIL_FROM={config['email_from']}\n")
-                f.write(f"EMAIL_TO={config['email_to']}\n")
-                f.write(f"SMTP_USE_TLS={str(config['smtp_use_tls']).lower()}\n")
+        contents = (f"# Watchman Monitoring Configuration\n"
+                    f"# Created automatically by duplicate report script\n\n"
+                    f"# Watchman API Settings (Required)\n"
+                    f"WATCHMAN_SUBDOMAIN={config['subdomain']}\n"
+                    f"WATCHMAN_API_KEY={config['api_key']}\n\n")
+        
+        if config.get('smtp_server'):
+            contents += (f"# Email Settings (Optional)\n"
+                         f"SMTP_SERVER={config['smtp_server']}\n"
+                         f"SMTP_PORT={config['smtp_port']}\n"
+                         f"SMTP_USERNAME={config['smtp_username']}\n"
+                         f"SMTP_PASSWORD={config['smtp_password']}\n"
+                         f"EMAIL_FROM={config['email_from']}\n"
+                         f"EMAIL_TO={config['email_to']}\n"
+                         f"SMTP_USE_TLS={str(config['smtp_use_tls']).lower()}\n")
+        
+        # Write a temp file and swap it in so an interrupted run never leaves a partial .env
+        temp_file = env_file + '.tmp'
+        with open(temp_file, 'w') as f:
+            f.write(contents)
+        os.replace(temp_file, env_file)
         
         print(f"\n✅ .env file created successfully!")
         print(f"📁 Location: {os.path.abspath(env_file)}")
@@ -762,34 +1166,61 @@ def load_or_create_env():
     except Exception as e:
         raise ValueError(f"Failed to create .env file: {e}")
 
-def print_summary(results: Dict):
+def print_summary(results: ReportResults):
     """Print summary of the duplicate analysis"""
-    print(f"\n📈 FINAL SUMMARY")
-    print("=" * 40)
-    print(f"Total duplicate groups found: {results.get('total_duplicate_groups', 0)}")
-    print(f"Total duplicate devices: {results.get('total_duplicate_devices', 0)}")
-    print(f"Devices to keep (newest): {len(results.get('devices_to_keep', []))}")
-    print(f"Devices to remove (older): {len(results.get('devices_to_remove', []))}")
-    
-    if results.get('devices_to_remove'):
-        print(f"\n💡 Next Steps:")
-        print(f"1. Review the detailed report above")
-        print(f"2. Manually remove devices marked as 'REMOVE' through Watchman web interface")
-        print(f"3. Keep devices marked as 'KEEP' (they have the most recent report dates)")
-        print(f"4. Use the computer URLs provided to navigate directly to each device")
+    sys.stdout.write(f"\n📈 FINAL SUMMARY\n"
+                     f"{'=' * 40}\n"
+                     f"Total duplicate groups found: {results.total_duplicate_groups}\n"
+                     f"Total duplicate devices: {results.total_duplicate_devices}\n"
+                     f"Devices to keep (newest): {len(results.devices_to_keep)}\n"
+                     f"Devices to remove (older): {len(results.devices_to_remove)}\n")
+    
+    if results.devices_to_remove:
+        sys.stdout.write("\n💡 Next Steps:\n"
+                         "1. Review the detailed report above\n"
+                         "2. Manually remove devices marked as 'REMOVE' through Watchman web interface\n"
+                         "3. Keep devices marked as 'KEEP' (they have the most recent report dates)\n"
+                         "4. Use the computer URLs provided to navigate directly to each device\n")
 
-def main():
+def parse_args(argv: List[str] = None):
+    """
+    Parse command line arguments
+    
+    Invocations that only use boolean flags (including none at all) are read directly,
+    so the common scheduled runs skip importing and building argparse. Anything else,
+    including --help, goes through argparse.
+    """
+    if argv is None:
+        argv = sys.argv[1:]
+    
+    if _FAST_PATH_FLAGS.issuperset(argv):
+        return SimpleNamespace(
+            verbose='--verbose' in argv,
+            subdomain=None,
+            api_key=None,
+            reset_env='--reset-env' in argv,
+            export_csv='--export-csv' in argv,
+            csv_filename=DEFAULT_CSV_FILENAME,
+            no_email='--no-email' in argv,
+            email_only='--email-only' in argv
+        )
+    
+    import argparse
+    
     parser = argparse.ArgumentParser(description='Generate report of duplicate devices in Watchman Monitoring')
     parser.add_argument('--verbose', action='store_true', help='Enable verbose output')
     parser.add_argument('--subdomain', help='Override subdomain from .env file')
     parser.add_argument('--api-key', help='Override API key from .env file')
     parser.add_argument('--reset-env', action='store_true', help='Reset .env file with new credentials')
     parser.add_argument('--export-csv', action='store_true', help='Export report to CSV file')
-    parser.add_argument('--csv-filename', default='watchman_duplicates_report.csv', help='CSV filename (default: watchman_duplicates_report.csv)')
+    parser.add_argument('--csv-filename', default=DEFAULT_CSV_FILENAME, help=f'CSV filename (default: {DEFAULT_CSV_FILENAME})')
     parser.add_argument('--no-email', action='store_true', help='Disable automatic email sending')
     parser.add_argument('--email-only', action='store_true', help='Send email only, suppress console output')
     
-    args = parser.parse_args()
+    return parser.parse_args(argv)
+
+def main():
+    args = parse_args()
     
     try:
         # Handle --reset-env flag
@@ -799,35 +1230,36 @@ def main():
                 os.remove('.env')
             print("🔧 Creating new .env file...")
         
-        # Load configuration from .env or command line
-        if args.subdomain and args.api_key:
-            config = {
-                'subdomain': args.subdomain,
-                'api_key': args.api_key
-            }
+        # Load configuration: the .env file is only read when a credential flag is missing,
+        # and flags that were given take precedence over its values
+        cli_credentials = {config_key: value for config_key, value in (('subdomain', args.subdomain), ('api_key', args.api_key))
+                           if value}
+        if len(cli_credentials) == 2:
+            config = cli_credentials
             if not args.email_only:
                 print("Using credentials from command line arguments")
         else:
             if not args.email_only:
                 print("Loading configuration from .env file...")
             config = load_or_create_env()
+            config.update(cli_credentials)
             if not args.email_only:
                 print(f"✅ Loaded configuration for subdomain: {config['subdomain']}")
         
-        # Initialize API client and email reporter
+        # Initialize API client; the email reporter waits until there is something to send
         api = WatchmanAPI(config['subdomain'], config['api_key'])
         reporter = DuplicateReporter(api)
-        email_reporter = EmailReporter(config)
+        smtp_configured = EmailReporter.is_configured(config)
         
         # Determine if email should be sent
-        send_email = not args.no_email and email_reporter.smtp_configured
+        send_email = not args.no_email and smtp_configured
         
         if not args.email_only:
             print("🎯 Watchman Duplicate Device Report")
             print("=" * 50)
             if send_email:
                 print(f"📧 Email will be sent to: {config.get('email_to', 'configured recipient')}")
-            elif not email_reporter.smtp_configured:
+            elif not smtp_configured:
                 print("ℹ️  Email not configured - report will only be displayed")
             else:
                 print("ℹ️  Email disabled with --no-email flag")
@@ -860,74 +1292,22 @@ def main():
         if not args.email_only:
             print(f"⚠️  Found duplicates! Preparing detailed report...")
         
-        # Identify devices to remove
-        devices_to_remove = reporter.identify_devices_to_remove(duplicate_groups)
-        
-        # Generate comprehensive report
-        if args.email_only:
-            # Minimal output for email-only mode
-            results = {
-                'total_duplicate_groups': len(duplicate_groups),
-                'total_duplicate_devices': sum(len(computers) for computers in duplicate_groups.values()),
-                'devices_to_keep': [],
-                'devices_to_remove': [],
-                'duplicate_groups_detail': []
-            }
-            
-            # Process groups for email
-            for composite_key, computers in duplicate_groups.items():
-                # Parse the composite key to get MAC and OS type
-                mac_address, os_type = composite_key.rsplit('_', 1)
-                computer_dates = []
-                for computer in computers:
-                    last_report_date = reporter.parse_last_report(computer.get('last_report'))
-                    computer_dates.append((computer, last_report_date))
-                
-                computer_dates.sort(key=lambda x: x[1] if x[1] is not None else datetime.min, reverse=True)
-                
-                group_detail = {
-                    'mac_address': mac_address,
-                    'os_type': os_type.upper(),
-                    'total_devices': len(computers),
-                    'device_to_keep': None,
-                    'devices_to_remove': []
-                }
-                
-                for i, (computer, date) in enumerate(computer_dates):
-                    device_info = {
-                        'computer_name': computer.get('computer_name', 'Unknown'),
-                        'client_id': computer.get('client_id', 'Unknown'),
-                        'uid': computer.get('uid', 'Unknown'),
-                        'last_report': computer.get('last_report'),
-                        'last_report_parsed': date.isoformat() if date else 'Unknown',
-                        'group': computer.get('group', 'Unknown'),
-                        'serial_number': computer.get('serial_number', 'Unknown'),
-                        'os_version': computer.get('os_version', 'Unknown'),
-                        'computer_url': computer.get('computer_url', 'N/A')
-                    }
-                    
-                    if i == 0:
-                        group_detail['device_to_keep'] = device_info
-                        results['devices_to_keep'].append(device_info)
-                    else:
-                        group_detail['devices_to_remove'].append(device_info)
-                        results['devices_to_remove'].append(device_info)
-                
-                results['duplicate_groups_detail'].append(group_detail)
-        else:
-            results = reporter.generate_report(devices_to_remove, duplicate_groups)
+        # Generate comprehensive report, streaming the CSV export (if requested) in the same
+        # pass; --email-only skips the console analysis
+        with reporter.csv_export(args.csv_filename) if args.export_csv else nullcontext() as csv_writer:
+            if args.email_only:
+                results = reporter.build_results_unified(duplicate_groups, csv_writer)
+            else:
+                devices_to_remove = reporter.identify_devices_to_remove(duplicate_groups)
+                results = reporter.generate_report(devices_to_remove, duplicate_groups, csv_writer)
         
-        # Export to CSV if requested
-        csv_file = None
-        if args.export_csv:
-            if reporter.export_report_to_csv(results, args.csv_filename):
-                csv_file = args.csv_filename
+        csv_file = args.csv_filename if csv_writer is not None and csv_writer.ok else None
         
         # Send email automatically if configured and duplicates found
         if send_email:
             if not args.email_only:
                 print(f"\n📧 Sending email report...")
-            email_sent = email_reporter.send_report_email(results, csv_file)
+            email_sent = EmailReporter(config).send_report_email(results, csv_file)
             
             if not args.email_only:
                 if email_sent: